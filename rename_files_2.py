@@ -1,7 +1,18 @@
+import fnmatch
 import os
 import re
+import shutil
+import socket
+import struct
+import time
+from contextlib import contextmanager
 from datetime import datetime
 
+try:
+    import fcntl
+except ImportError:  # Windows has no fcntl; lease files are used instead
+    fcntl = None
+
 GENERIC_MP4_PATTERN = re.compile(r".+\.mp4$", re.IGNORECASE)
 GENERIC_JPEG_PATTERN = re.compile(r".+\.jpeg$", re.IGNORECASE)
 TITLE_LINE_PATTERN = re.compile(r"^title:\s*(.+)$", re.IGNORECASE)
@@ -9,38 +20,556 @@ EPISODE_NUMBER_PATTERN = re.compile(r"(\d+)\.(mp4|jpeg)$", re.IGNORECASE)
 THUMBNAIL_NUMBER_PATTERN = re.compile(r".*\((\d+)\)\.jpeg$", re.IGNORECASE)
 DATETIME_PATTERN = re.compile(r"(\d{4}-\d{2}-\d{2} \d{2}-\d{2}-\d{2})")
 
+# Recording filename formats, tried in order at each position of the filename.
+# Placeholders: {Y} year, {m} month, {d} day, {H} hour, {M} minute, {S} second, {p} AM/PM
+RECORDING_TIMESTAMP_FORMATS = [
+    # OBS default: 2025-07-05 10-30-00.mp4
+    ("obs", r"{Y}-{m}-{d} {H}-{M}-{S}"),
+    # OBS custom formats: 2025-07-05_10-30-00.mp4, 2025-07-05T10-30-00.mp4, 20250705_103000.mp4
+    ("obs_custom", r"{Y}-{m}-{d}[_T]{H}[-.]{M}[-.]{S}"),
+    ("obs_compact", r"{Y}{m}{d}[_-]{H}{M}{S}"),
+    # NVIDIA ShadowPlay: Game 2025.07.05 - 10.30.00.01.DVR.mp4
+    ("shadowplay", r"{Y}\.{m}\.{d} - {H}\.{M}\.{S}"),
+    # Xbox Game Bar: Game 7_5_2025 10_30_00 AM.mp4
+    ("xbox_game_bar", r"{m}_{d}_{Y} {H}_{M}_{S} {p}"),
+]
+_TIMESTAMP_FIELD_PATTERNS = {
+    "Y": r"\d{4}",
+    "m": r"\d{1,2}",
+    "d": r"\d{1,2}",
+    "H": r"\d{1,2}",
+    "M": r"\d{2}",
+    "S": r"\d{2}",
+    "p": r"[AaPp][Mm]",
+}
+
+# Pair thumbnails to their nearest video by timestamp instead of by sorted position
+PAIR_BY_TIMESTAMP = False
+# A video and thumbnail further apart than this are never paired, both are reported as unmatched
+PAIR_MAX_GAP_SECONDS = 6 * 3600
+
+# Per-series locking so several hosts can work through a shared root.
+# None disables locking, "fcntl" uses advisory lock files, "lease" uses lease files with expiry
+# (for NFS mounts without working lock support), "auto" picks fcntl when available.
+SERIES_LOCKING = None
+SERIES_LOCK_FILENAME = ".rename.lock"
+SERIES_LEASE_SECONDS = 3600
+
+# "move" renames files into Processed. "link" leaves the originals in place and creates
+# Processed/Title N.ext as a reflink where the filesystem supports it, or a hardlink otherwise.
+ORGANIZE_MODE = "move"
+LINKED_MANIFEST_FILENAME = ".linked.txt"
+FICLONE = 0x40049409  # Linux ioctl: share the source file's extents with the destination
+
+# Traversal pruning: glob rules in the root-level ignore file skip whole subtrees, and a
+# folder containing the opt-out marker file is never descended into or processed.
+IGNORE_FILENAME = ".renameignore"
+OPT_OUT_MARKER = ".norename"
+
+# Directory fsync after renames so they survive a power loss. None skips fsync, "series" syncs
+# the source and Processed folders once per series, a number N syncs them every N pairs.
+DURABILITY = None
+
+EXIF_DATETIME_FORMAT = "%Y:%m:%d %H:%M:%S"
+EXIF_IFD_POINTER_TAG = 0x8769
+EXIF_DATETIME_TAG = 0x0132
+EXIF_DATETIME_ORIGINAL_TAG = 0x9003
+
+
+def _compile_recording_timestamp_formats(formats):
+    # Build a single alternation regex. Each format is wrapped in its own named group, so the
+    # group that closes last (match.lastindex) identifies which format matched. For each
+    # format we record the group numbers of its fields so parsing is plain int() calls.
+    branches = []
+    field_groups = {}
+    group_index = 0
+    for name, template in formats:
+        group_index += 1
+        branch_index = group_index
+        fields = {}
+
+        def field(match, name=name, fields=fields):
+            nonlocal group_index
+            group_index += 1
+            fields[match.group(1)] = group_index
+            return f"(?P<{name}_{match.group(1)}>{_TIMESTAMP_FIELD_PATTERNS[match.group(1)]})"
+
+        branch = re.sub(r"\{(\w)\}", field, template)
+        branches.append(f"(?P<{name}>{branch})")
+        field_groups[branch_index] = (
+            (fields["Y"], fields["m"], fields["d"], fields["H"], fields["M"], fields["S"]), fields.get("p"),
+        )
+    # Every format starts with a digit. The lookahead rejects all other positions before any
+    # branch is tried, so names without a timestamp cost about as much as a plain search.
+    return re.compile(r"(?=\d)(?:" + "|".join(branches) + ")"), field_groups
+
+RECORDING_TIMESTAMP_PATTERN, _RECORDING_TIMESTAMP_FIELDS = _compile_recording_timestamp_formats(RECORDING_TIMESTAMP_FORMATS)
+
+_DAYS_IN_MONTH = (0, 31, 29, 31, 30, 31, 30, 31, 31, 30, 31, 30, 31)
+
+def parse_recording_timestamp(filename):
+    # Returns (year, month, day, hour, minute, second) or None if no known format matches
+    match = RECORDING_TIMESTAMP_PATTERN.search(filename)
+    if not match:
+        return None
+    fields, meridiem = _RECORDING_TIMESTAMP_FIELDS[match.lastindex]
+    year, month, day, hour, minute, second = map(int, match.group(*fields))
+    if meridiem is not None:
+        if not 1 <= hour <= 12:
+            return None
+        hour = hour % 12 + (12 if match.group(meridiem)[0] in "Pp" else 0)
+    if not (1 <= month <= 12 and hour < 24 and minute < 60 and second < 60):
+        return None
+    if not 1 <= day <= _DAYS_IN_MONTH[month]:
+        # Only Feb 29 needs the leap year check; time.mktime would roll Feb 30 into March
+        return None
+    if month == 2 and day == 29 and not (year % 4 == 0 and (year % 100 != 0 or year % 400 == 0)):
+        return None
+    return (year, month, day, hour, minute, second)
 
 def _numeric_sort_key(filename):
 
 # This function is now only used for MP4s, not JPEGs
-    match = DATETIME_PATTERN.search(filename)
-    if match:
-        try:
-            dt = datetime.strptime(match.group(1), "%Y-%m-%d %H-%M-%S")
-            return (0, dt, filename)
-        except ValueError:
-            pass
+    parts = parse_recording_timestamp(filename)
+    if parts:
+        year, month, day, hour, minute, second = parts
+        return (0, ((((year * 100 + month) * 100 + day) * 100 + hour) * 100 + minute) * 100 + second, filename)
     return (1, filename)
 
 # JPEG sorting helpers
-def jpeg_sort_key_bracket(files):
+def _jpeg_bracket_key(file):
     # Sort by base name (without bracketed number), then by bracketed number (no number first)
-    def extract(file):
-        m = re.match(r"^(.*?)(?: \((\d+)\))?\.jpeg$", file, re.IGNORECASE)
-        if m:
-            base = m.group(1).strip().lower()
-            num = int(m.group(2)) if m.group(2) is not None else -1
-            return (base, num)
-        return (file.lower(), float('inf'))
-    return sorted(files, key=extract)
+    m = re.match(r"^(.*?)(?: \((\d+)\))?\.jpeg$", file, re.IGNORECASE)
+    if m:
+        base = m.group(1).strip().lower()
+        num = int(m.group(2)) if m.group(2) is not None else -1
+        return (base, num)
+    return (file.lower(), float('inf'))
+
+def _jpeg_number_key(file):
+    # Sort by the last number in the filename (before .jpeg)
+    m = re.findall(r"(\d+)(?=\D*\.jpeg$)", file, re.IGNORECASE)
+    num = int(m[-1]) if m else float('inf')
+    return num
+
+def jpeg_sort_key_bracket(files):
+    return sorted(files, key=_jpeg_bracket_key)
 
 def jpeg_sort_key_number(files):
-    # Sort by the last number in the filename (before .jpeg)
-    def extract(file):
-        m = re.findall(r"(\d+)(?=\D*\.jpeg$)", file, re.IGNORECASE)
-        num = int(m[-1]) if m else float('inf')
-        return num
-    return sorted(files, key=extract)
+    return sorted(files, key=_jpeg_number_key)
+
+# Series records
+# __slots__ keeps per-file overhead fixed when a whole root is planned up front
+RECORD_MEMORY_BUDGET_PER_FILE = 320  # bytes per MediaFile incl. its share of EpisodePair, excluding the filename
+
+class MediaFile:
+    __slots__ = ("name", "sort_key", "size", "mtime", "ino")
+
+    def __init__(self, name, size=0, mtime=0.0, sort_key=None, ino=None):
+        self.name = name
+        self.size = size
+        self.mtime = mtime
+        self.sort_key = sort_key
+        self.ino = ino
+
+class EpisodePair:
+    __slots__ = ("mp4", "jpeg", "episode")
+
+    def __init__(self, mp4, jpeg, episode=None):
+        self.mp4 = mp4
+        self.jpeg = jpeg
+        self.episode = episode
+
+class Series:
+    __slots__ = ("path", "title", "mp4_files", "jpeg_files")
+
+    def __init__(self, path, title=None):
+        self.path = path
+        self.title = title
+        self.mp4_files = []
+        self.jpeg_files = []
+
+    def sort(self):
+        # Sort keys are computed once per file and kept on the record
+        for media in self.mp4_files:
+            media.sort_key = _numeric_sort_key(media.name)
+        has_bracketed = any(THUMBNAIL_NUMBER_PATTERN.match(m.name) for m in self.jpeg_files)
+        print(f"DEBUG: JPEG bracketed detection: {has_bracketed}")
+        jpeg_key = _jpeg_bracket_key if has_bracketed else _jpeg_number_key
+        for media in self.jpeg_files:
+            media.sort_key = jpeg_key(media.name)
+        self.mp4_files.sort(key=lambda m: m.sort_key)
+        self.jpeg_files.sort(key=lambda m: m.sort_key)
+        return has_bracketed
+
+# Timestamp pairing helpers
+def _read_ifd_entries(tiff, offset, endian):
+    # Yield (tag, type, count, value_or_offset_bytes) for each entry of the IFD at offset
+    if offset + 2 > len(tiff):
+        return
+    (count,) = struct.unpack_from(endian + "H", tiff, offset)
+    for i in range(count):
+        entry = offset + 2 + i * 12
+        if entry + 12 > len(tiff):
+            return
+        tag, typ, n = struct.unpack_from(endian + "HHI", tiff, entry)
+        yield tag, typ, n, tiff[entry + 8:entry + 12]
+
+def _read_exif_ascii(tiff, typ, n, raw, endian):
+    if typ != 2:
+        return None
+    if n <= 4:
+        data = raw[:n]
+    else:
+        (offset,) = struct.unpack(endian + "I", raw)
+        data = tiff[offset:offset + n]
+    return data.split(b"\x00", 1)[0].decode("ascii", "ignore").strip()
+
+def _parse_exif_datetime(tiff):
+    # tiff is the APP1 payload after the "Exif\0\0" header
+    if tiff[:2] == b"II":
+        endian = "<"
+    elif tiff[:2] == b"MM":
+        endian = ">"
+    else:
+        return None
+    magic, ifd0 = struct.unpack_from(endian + "HI", tiff, 2)
+    if magic != 42:
+        return None
+
+    fallback = None
+    exif_ifd = None
+    for tag, typ, n, raw in _read_ifd_entries(tiff, ifd0, endian):
+        if tag == EXIF_IFD_POINTER_TAG:
+            (exif_ifd,) = struct.unpack(endian + "I", raw)
+        elif tag == EXIF_DATETIME_TAG:
+            fallback = _read_exif_ascii(tiff, typ, n, raw, endian)
+
+    if exif_ifd is not None:
+        for tag, typ, n, raw in _read_ifd_entries(tiff, exif_ifd, endian):
+            if tag == EXIF_DATETIME_ORIGINAL_TAG:
+                value = _read_exif_ascii(tiff, typ, n, raw, endian)
+                if value:
+                    return value
+    return fallback
+
+def read_exif_datetime(jpeg_path):
+    # Read only the JPEG marker segments up to the first APP1/EXIF block, never the image data
+    try:
+        with open(jpeg_path, "rb") as f:
+            if f.read(2) != b"\xff\xd8":
+                return None
+            while True:
+                marker = f.read(2)
+                if len(marker) < 2 or marker[0] != 0xFF:
+                    return None
+                kind = marker[1]
+                if kind in (0xD8, 0x01) or 0xD0 <= kind <= 0xD7:
+                    continue
+                if kind in (0xD9, 0xDA):
+                    return None
+                length_bytes = f.read(2)
+                if len(length_bytes) < 2:
+                    return None
+                (length,) = struct.unpack(">H", length_bytes)
+                if kind == 0xE1:
+                    segment = f.read(length - 2)
+                    if segment[:6] == b"Exif\x00\x00":
+                        value = _parse_exif_datetime(segment[6:])
+                        if value:
+                            return datetime.strptime(value, EXIF_DATETIME_FORMAT)
+                        return None
+                else:
+                    f.seek(length - 2, os.SEEK_CUR)
+    except (OSError, struct.error, ValueError) as e:
+        print(f"DEBUG: Could not read EXIF data from {jpeg_path}: {e}.")
+    return None
+
+def get_jpeg_timestamp(series_path, media):
+    dt = read_exif_datetime(os.path.join(series_path, media.name))
+    if dt is not None:
+        return dt.timestamp()
+    print(f"DEBUG: No EXIF DateTimeOriginal in {media.name}. Falling back to mtime.")
+    return media.mtime
+
+def get_mp4_timestamp(media):
+    parts = parse_recording_timestamp(media.name)
+    if parts:
+        return time.mktime(parts + (0, 0, -1))
+    print(f"DEBUG: No recording timestamp in {media.name}. Falling back to mtime.")
+    return media.mtime
+
+def pair_files_by_timestamp(series_path, mp4_files, jpeg_files, max_gap=PAIR_MAX_GAP_SECONDS):
+    # Takes MediaFile records and returns (EpisodePair list, unmatched MP4s, unmatched JPEGs).
+    # Sorted merge: each side is sorted once, then walked with two cursors.
+    # A file is skipped as unmatched when its neighbour on the same side is closer to the
+    # current candidate on the other side, so each thumbnail goes to its nearest video.
+    # When even the nearest candidates are more than max_gap apart, neither has a match.
+    for media in mp4_files:
+        media.sort_key = get_mp4_timestamp(media)
+    for media in jpeg_files:
+        media.sort_key = get_jpeg_timestamp(series_path, media)
+    videos = sorted(mp4_files, key=lambda m: m.sort_key)
+    thumbs = sorted(jpeg_files, key=lambda m: m.sort_key)
+
+    pairs = []
+    unmatched_mp4 = []
+    unmatched_jpeg = []
+    i = j = 0
+    while i < len(videos) and j < len(thumbs):
+        video = videos[i]
+        thumb = thumbs[j]
+        gap = abs(video.sort_key - thumb.sort_key)
+        if j + 1 < len(thumbs) and abs(video.sort_key - thumbs[j + 1].sort_key) < gap:
+            unmatched_jpeg.append(thumb)
+            j += 1
+        elif i + 1 < len(videos) and abs(videos[i + 1].sort_key - thumb.sort_key) < gap:
+            unmatched_mp4.append(video)
+            i += 1
+        elif gap > max_gap:
+            unmatched_mp4.append(video)
+            unmatched_jpeg.append(thumb)
+            i += 1
+            j += 1
+        else:
+            pairs.append(EpisodePair(video, thumb))
+            i += 1
+            j += 1
+    unmatched_mp4.extend(videos[i:])
+    unmatched_jpeg.extend(thumbs[j:])
+    return pairs, unmatched_mp4, unmatched_jpeg
+
+# Series locking helpers
+def _try_fcntl_lock(lock_path):
+    f = open(lock_path, "a+")
+    try:
+        fcntl.lockf(f, fcntl.LOCK_EX | fcntl.LOCK_NB)
+    except OSError:
+        f.close()
+        return None
+    return f
+
+def _remove_expired_lease(lock_path, expired):
+    # Removing an expired lease is check-then-act, so it is serialized through a takeover ticket
+    # named after that exact lease file (inode and mtime). Only the host that creates the ticket
+    # may remove the lease, and only after re-checking it is still the same expired file.
+    # A host that arrives after the ticket is gone sees the new lease and leaves it alone.
+    ticket = f"{lock_path}.takeover.{expired.st_ino}.{expired.st_mtime_ns}"
+    try:
+        fd = os.open(ticket, os.O_CREAT | os.O_EXCL | os.O_WRONLY)
+    except FileExistsError:
+        try:
+            # A ticket this old was left by a host that crashed mid-takeover
+            if time.time() - os.stat(ticket).st_mtime >= SERIES_LEASE_SECONDS:
+                os.remove(ticket)
+        except FileNotFoundError:
+            pass
+        return
+    os.close(fd)
+    try:
+        current = os.stat(lock_path)
+        if (current.st_ino, current.st_mtime_ns) == (expired.st_ino, expired.st_mtime_ns):
+            os.remove(lock_path)
+    except FileNotFoundError:
+        pass
+    finally:
+        os.remove(ticket)
+
+def _try_lease(lock_path, token):
+    for _ in range(2):
+        try:
+            fd = os.open(lock_path, os.O_CREAT | os.O_EXCL | os.O_WRONLY)
+        except FileExistsError:
+            try:
+                st = os.stat(lock_path)
+            except FileNotFoundError:
+                continue
+            age = time.time() - st.st_mtime
+            if age < SERIES_LEASE_SECONDS:
+                return False
+            print(f"DEBUG: Lease {lock_path} expired {int(age)}s ago. Taking it over.")
+            _remove_expired_lease(lock_path, st)
+            continue
+        with os.fdopen(fd, "w") as f:
+            f.write(token)
+        return True
+    return False
+
+def _release_lease(lock_path, token):
+    # Only remove the lease if another host has not taken it over after expiry
+    try:
+        with open(lock_path, "r") as f:
+            owned = f.read() == token
+        if owned:
+            os.remove(lock_path)
+    except OSError as e:
+        print(f"DEBUG: Failed to release lease {lock_path}: {e}.")
+
+class SeriesLock:
+    # Truthy while this process holds the series. Lease locks carry the lease path and token so
+    # they can be renewed; fcntl locks are held by the open file until it is closed.
+    __slots__ = ("held", "lock_path", "token")
+
+    def __init__(self, held, lock_path=None, token=None):
+        self.held = held
+        self.lock_path = lock_path
+        self.token = token
+
+    def __bool__(self):
+        return self.held
+
+    def renew(self):
+        # Returns False once the lease is no longer ours, e.g. another host took it over after
+        # it expired. Otherwise pushes the lease expiry forward by SERIES_LEASE_SECONDS.
+        if not self.held or self.token is None:
+            return self.held
+        try:
+            with open(self.lock_path, "r") as f:
+                owned = f.read() == self.token
+            if owned:
+                os.utime(self.lock_path)
+        except OSError as e:
+            print(f"DEBUG: Failed to renew lease {self.lock_path}: {e}.")
+            owned = False
+        if not owned:
+            self.held = False
+        return owned
+
+@contextmanager
+def series_lock(series_path, locking="auto"):
+    # Yields a SeriesLock that is truthy if this process holds the series, falsy if another does.
+    # Never blocks: busy series are skipped so each host moves on to the next one.
+    if locking is None:
+        yield SeriesLock(True)
+        return
+    if locking == "auto":
+        locking = "fcntl" if fcntl is not None else "lease"
+    lock_path = os.path.join(series_path, SERIES_LOCK_FILENAME)
+
+    if locking == "fcntl":
+        try:
+            lock_file = _try_fcntl_lock(lock_path)
+        except OSError as e:
+            print(f"DEBUG: Failed to open lock file {lock_path}: {e}.")
+            lock_file = None
+        if lock_file is None:
+            yield SeriesLock(False)
+            return
+        try:
+            yield SeriesLock(True)
+        finally:
+            lock_file.close()
+    elif locking == "lease":
+        token = f"{socket.gethostname()} {os.getpid()} {time.time()}"
+        try:
+            acquired = _try_lease(lock_path, token)
+        except OSError as e:
+            print(f"DEBUG: Failed to create lease {lock_path}: {e}.")
+            acquired = False
+        if not acquired:
+            yield SeriesLock(False)
+            return
+        try:
+            yield SeriesLock(True, lock_path, token)
+        finally:
+            _release_lease(lock_path, token)
+    else:
+        raise ValueError(f"Unknown locking mode: {locking}")
+
+# Link mode helpers
+def link_file(src, dst):
+    # Returns "reflink" or "hardlink". Only metadata is written either way, never file data.
+    if fcntl is not None:
+        with open(src, "rb") as src_file, open(dst, "xb") as dst_file:
+            try:
+                fcntl.ioctl(dst_file.fileno(), FICLONE, src_file.fileno())
+                cloned = True
+            except OSError:
+                cloned = False
+        if cloned:
+            shutil.copystat(src, dst)
+            return "reflink"
+        os.remove(dst)
+    os.link(src, dst)
+    return "hardlink"
+
+def read_hardlinked_inodes(series_path, processed_folder_path):
+    # A hardlinked source shares its inode with its Processed entry. That holds however the
+    # episode is edited or re-timestamped afterwards, so hardlinks are matched on inode rather
+    # than through the manifest. Hardlinks cannot cross devices, so a Processed folder on
+    # another device cannot hold any.
+    if not os.path.isdir(processed_folder_path):
+        return set()
+    if os.stat(series_path).st_dev != os.stat(processed_folder_path).st_dev:
+        return set()
+    with os.scandir(processed_folder_path) as entries:
+        return {entry.inode() for entry in entries if entry.is_file()}
+
+def _linked_source_key(media):
+    # Reflinks get their own inode, so they are recorded in the manifest instead. Recorders and
+    # Windows screenshots reuse names, so a name alone does not identify a source.
+    return (media.name, media.size, repr(media.mtime))
+
+def read_linked_sources(processed_folder_path):
+    # Manifest lines are "size<TAB>mtime<TAB>name"; returns a set of (name, size, mtime) keys
+    manifest = os.path.join(processed_folder_path, LINKED_MANIFEST_FILENAME)
+    if not os.path.exists(manifest):
+        return set()
+    linked = set()
+    with open(manifest, "r", encoding="utf-8") as f:
+        for line in f:
+            parts = line.rstrip("\n").split("\t", 2)
+            if len(parts) == 3:
+                size, mtime, name = parts
+                linked.add((name, int(size), mtime))
+    return linked
+
+def record_linked_sources(processed_folder_path, media_files):
+    manifest = os.path.join(processed_folder_path, LINKED_MANIFEST_FILENAME)
+    with open(manifest, "a", encoding="utf-8") as f:
+        for media in media_files:
+            name, size, mtime = _linked_source_key(media)
+            f.write(f"{size}\t{mtime}\t{name}\n")
+
+# Ignore rule helpers
+def compile_ignore_rules(rules):
+    # Rules use glob syntax, one per line; blank lines and "#" comments are skipped.
+    # A rule without "/" matches a folder name at any depth (e.g. ".git", "*_renders").
+    # A rule with "/" matches the folder path relative to the root (e.g. "Archive/2019*").
+    # All rules are compiled into at most two regexes, so each check is a single match call.
+    name_rules = []
+    path_rules = []
+    for rule in rules:
+        rule = rule.strip()
+        if not rule or rule.startswith("#"):
+            continue
+        rule = rule.rstrip("/")
+        if "/" in rule:
+            path_rules.append(fnmatch.translate(rule.lstrip("/")))
+        else:
+            name_rules.append(fnmatch.translate(rule))
+    if not name_rules and not path_rules:
+        return None
+    name_pattern = re.compile("|".join(name_rules)) if name_rules else None
+    path_pattern = re.compile("|".join(path_rules)) if path_rules else None
+
+    def is_ignored(rel_path):
+        rel_path = rel_path.replace(os.sep, "/")
+        if name_pattern is not None and name_pattern.match(rel_path.rsplit("/", 1)[-1]):
+            return True
+        return path_pattern is not None and path_pattern.match(rel_path) is not None
+
+    return is_ignored
+
+def load_ignore_rules(root_path):
+    ignore_file = os.path.join(root_path, IGNORE_FILENAME)
+    if not os.path.exists(ignore_file):
+        print(f"DEBUG: No {IGNORE_FILENAME} at {root_path}. Nothing will be pruned.")
+        return None
+    with open(ignore_file, "r", encoding="utf-8") as f:
+        is_ignored = compile_ignore_rules(f)
+    print(f"DEBUG: Loaded ignore rules from {ignore_file}.")
+    return is_ignored
 
 def get_series_title(series_path):
     index_file = os.path.join(series_path, "index.txt")
@@ -76,23 +605,74 @@ def get_next_episode_number(series_path):
     print(f"DEBUG: Next episode number will be: {max_episode + 1}")
     return max_episode + 1
 
+class RunSummary:
+    __slots__ = ("series", "pairs", "fsyncs", "fsync_failures", "fsync_seconds")
+
+    def __init__(self):
+        self.series = 0
+        self.pairs = 0
+        self.fsyncs = 0
+        self.fsync_failures = 0
+        self.fsync_seconds = 0.0
+
+    def report(self):
+        print(f"DEBUG: Run summary: {self.pairs} pairs organized in {self.series} series, "
+              f"{self.fsyncs} fsyncs taking {self.fsync_seconds:.3f}s, "
+              f"{self.fsync_failures} fsyncs failed.")
+
+def _fsync_path(path, flags, summary=None):
+    start = time.perf_counter()
+    try:
+        fd = os.open(path, flags)
+        try:
+            os.fsync(fd)
+        finally:
+            os.close(fd)
+    except OSError as e:
+        print(f"DEBUG: Failed to fsync {path}: {e}.")
+        if summary is not None:
+            summary.fsync_failures += 1
+        return False
+    finally:
+        if summary is not None:
+            summary.fsync_seconds += time.perf_counter() - start
+    if summary is not None:
+        summary.fsyncs += 1
+    return True
+
+def fsync_directory(path, summary=None):
+    # Persists the directory entries (renames, new links) of path, not the file contents
+    return _fsync_path(path, os.O_RDONLY | getattr(os, "O_DIRECTORY", 0), summary)
+
+def fsync_file(path, summary=None):
+    # Opened for writing because Windows cannot flush a read-only handle
+    return _fsync_path(path, os.O_RDWR, summary)
+
+def scan_series(series_path, title=None):
+    print(f"DEBUG: Entering scan_series for path: {series_path}")
+    series = Series(series_path, title)
+
+    with os.scandir(series_path) as entries:
+        for entry in entries:
+            if not entry.is_file():
+                continue
+            if GENERIC_MP4_PATTERN.match(entry.name):
+                target = series.mp4_files
+                print(f"DEBUG: Found MP4 file to process: {entry.name}")
+            elif GENERIC_JPEG_PATTERN.match(entry.name):
+                target = series.jpeg_files
+                print(f"DEBUG: Found JPEG file to process: {entry.name}")
+            else:
+                continue
+            st = entry.stat()
+            target.append(MediaFile(entry.name, st.st_size, st.st_mtime, ino=st.st_ino))
+
+    print(f"DEBUG: Found {len(series.mp4_files)} MP4 files and {len(series.jpeg_files)} JPEG files.")
+    return series
+
 def find_files_to_process(series_path):
-    print(f"DEBUG: Entering find_files_to_process for path: {series_path}")
-    mp4_files = []
-    jpeg_files = []
-
-    for filename in os.listdir(series_path):
-        full_path = os.path.join(series_path, filename)
-        if os.path.isfile(full_path):
-            if GENERIC_MP4_PATTERN.match(filename):
-                mp4_files.append(filename)
-                print(f"DEBUG: Found MP4 file to process: {filename}")
-            elif GENERIC_JPEG_PATTERN.match(filename):
-                jpeg_files.append(filename)
-                print(f"DEBUG: Found JPEG file to process: {filename}")
-
-    print(f"DEBUG: Found {len(mp4_files)} MP4 files and {len(jpeg_files)} JPEG files.")
-    return mp4_files, jpeg_files
+    series = scan_series(series_path)
+    return [m.name for m in series.mp4_files], [m.name for m in series.jpeg_files]
 
 def create_processed_folder(series_path):
     print(f"DEBUG: Entering create_processed_folder for path: {series_path}")
@@ -120,81 +700,172 @@ def rename_file_pair(mp4_filename, jpeg_filename, base_title, next_episode, proc
     print(f"DEBUG: New MP4 path: {new_mp4_path}, New jpeg path: {new_jpeg_path}")
     return new_mp4_path, new_jpeg_path
 
-def rename_files_in_series(series_path):
+def rename_files_in_series(series_path, pair_by_timestamp=False, locking=None, organize="move", durability=None, summary=None):
     print(f"DEBUG: Entering rename_files_in_series for path: {series_path}")
-    try:
-        base_title = get_series_title(series_path)
-        print(f"DEBUG: Successfully retrieved base title: '{base_title}'")
-    except ValueError as e:
-        print(f"DEBUG: Failed to get series title for {series_path}: {e}. Skipping series.")
-        return
-    
-    mp4_files, jpeg_files = find_files_to_process(series_path)
-
-    if not mp4_files and not jpeg_files:
-        print(f"DEBUG: No MP4 or jpeg files found to process in {series_path}. Skipping.")
-        return
-    elif len(mp4_files) != len(jpeg_files):
-        print(f"DEBUG: Mismatch in number of MP4 ({len(mp4_files)}) and jpeg ({len(jpeg_files)}) files. Skipping series {series_path}.")
-        return
-
-    processed_folder = os.path.join(series_path, "Processed")
-    create_processed_folder(series_path)
-
-    # Sort MP4s as before
-    mp4_files.sort(key=_numeric_sort_key)
-
-    # Detect bracketed JPEGs in this series
-    has_bracketed = any(re.match(r".*\(\d+\)\.jpeg$", f, re.IGNORECASE) for f in jpeg_files)
-    print(f"DEBUG: JPEG bracketed detection: {has_bracketed}")
-    if has_bracketed:
-        jpeg_files = jpeg_sort_key_bracket(jpeg_files)
-        print(f"DEBUG: JPEG files sorted using bracketed logic: {jpeg_files}")
-    else:
-        jpeg_files = jpeg_sort_key_number(jpeg_files)
-        print(f"DEBUG: JPEG files sorted using number-at-end logic: {jpeg_files}")
-
-    print("DEBUG: Files sorted using custom logic for correct sequence.")
-
-    next_episode = get_next_episode_number(series_path)
-    print(f"DEBUG: Starting episode numbering from: {next_episode}")
-
-    for i in range(len(mp4_files)):
-        mp4_filename = mp4_files[i]
-        jpeg_filename = jpeg_files[i]
-
-        new_mp4_path, new_jpeg_path = rename_file_pair(mp4_filename, jpeg_filename, base_title, next_episode, processed_folder)
+    if organize not in ("move", "link"):
+        raise ValueError(f"Unknown organize mode: {organize}")
+    # bool is an int subclass; DURABILITY = True must not silently mean "fsync every pair"
+    if durability not in (None, "series") and (isinstance(durability, bool) or not (isinstance(durability, int) and durability > 0)):
+        raise ValueError(f"Unknown durability mode: {durability}")
+    with series_lock(series_path, locking) as lock:
+        if not lock:
+            print(f"DEBUG: Series {series_path} is locked by another process. Skipping.")
+            return
 
         try:
-            os.rename(os.path.join(series_path, mp4_filename), new_mp4_path)
-            print(f"DEBUG: Successfully renamed MP4 file: {mp4_filename} to {new_mp4_path}")
-            os.rename(os.path.join(series_path, jpeg_filename), new_jpeg_path)
-            print(f"DEBUG: Successfully renamed jpeg file: {jpeg_filename} to {new_jpeg_path}")
-        except OSError as e:
-            print(f"DEBUG: Failed to rename files {mp4_filename} or {jpeg_filename} in {series_path}: {e}. Skipping this pair.")
-            continue
-
-        next_episode += 1
-
-def loop_over_directories(series_path):
+            base_title = get_series_title(series_path)
+            print(f"DEBUG: Successfully retrieved base title: '{base_title}'")
+        except ValueError as e:
+            print(f"DEBUG: Failed to get series title for {series_path}: {e}. Skipping series.")
+            return
+    
+        series = scan_series(series_path, base_title)
+        processed_folder = os.path.join(series_path, "Processed")
+
+        if organize == "link":
+            reflinked = read_linked_sources(processed_folder)
+            hardlinked = read_hardlinked_inodes(series_path, processed_folder)
+            if reflinked or hardlinked:
+                def already_linked(media):
+                    return media.ino in hardlinked or _linked_source_key(media) in reflinked
+
+                source_count = len(series.mp4_files) + len(series.jpeg_files)
+                series.mp4_files = [m for m in series.mp4_files if not already_linked(m)]
+                series.jpeg_files = [m for m in series.jpeg_files if not already_linked(m)]
+                skipped = source_count - len(series.mp4_files) - len(series.jpeg_files)
+                print(f"DEBUG: Ignoring {skipped} source files already linked into {processed_folder}.")
+
+        if not series.mp4_files and not series.jpeg_files:
+            print(f"DEBUG: No MP4 or jpeg files found to process in {series_path}. Skipping.")
+            return
+
+        if pair_by_timestamp:
+            pairs, unmatched_mp4, unmatched_jpeg = pair_files_by_timestamp(series_path, series.mp4_files, series.jpeg_files)
+            print(f"DEBUG: Paired {len(pairs)} files by timestamp.")
+            for media in unmatched_mp4:
+                print(f"DEBUG: Unmatched MP4 file left in place: {media.name}")
+            for media in unmatched_jpeg:
+                print(f"DEBUG: Unmatched jpeg file left in place: {media.name}")
+            if not pairs:
+                print(f"DEBUG: No MP4/jpeg pairs could be matched in {series_path}. Skipping.")
+                return
+        else:
+            if len(series.mp4_files) != len(series.jpeg_files):
+                print(f"DEBUG: Mismatch in number of MP4 ({len(series.mp4_files)}) and jpeg ({len(series.jpeg_files)}) files. Skipping series {series_path}.")
+                return
+
+            series.sort()
+            print("DEBUG: Files sorted using custom logic for correct sequence.")
+            pairs = [EpisodePair(mp4, jpeg) for mp4, jpeg in zip(series.mp4_files, series.jpeg_files)]
+
+        create_processed_folder(series_path)
+
+        next_episode = get_next_episode_number(series_path)
+        print(f"DEBUG: Starting episode numbering from: {next_episode}")
+        if summary is not None:
+            summary.series += 1
+
+        def sync_directories():
+            if organize == "link":
+                # The manifest decides which sources are already organized, so its appended
+                # lines must be as durable as the links they describe
+                manifest = os.path.join(processed_folder, LINKED_MANIFEST_FILENAME)
+                if os.path.exists(manifest):
+                    fsync_file(manifest, summary)
+            fsync_directory(series_path, summary)
+            fsync_directory(processed_folder, summary)
+            print(f"DEBUG: Synced {series_path} and {processed_folder} to disk.")
+
+        unsynced = 0
+        for pair in pairs:
+            # Renewing per pair keeps a long series from outliving its lease, and stops this host
+            # before the next rename if another host has taken the series over
+            if not lock.renew():
+                print(f"DEBUG: Lost the lock on {series_path} to another process. Stopping this series.")
+                break
+            if isinstance(durability, int) and unsynced >= durability:
+                sync_directories()
+                unsynced = 0
+            unsynced += 1
+            pair.episode = next_episode
+            mp4_filename = pair.mp4.name
+            jpeg_filename = pair.jpeg.name
+            new_mp4_path, new_jpeg_path = rename_file_pair(mp4_filename, jpeg_filename, base_title, pair.episode, processed_folder)
+
+            if organize == "link":
+                try:
+                    mp4_method = link_file(os.path.join(series_path, mp4_filename), new_mp4_path)
+                    print(f"DEBUG: Successfully linked MP4 file ({mp4_method}): {mp4_filename} to {new_mp4_path}")
+                    try:
+                        jpeg_method = link_file(os.path.join(series_path, jpeg_filename), new_jpeg_path)
+                    except OSError:
+                        os.remove(new_mp4_path)
+                        raise
+                    print(f"DEBUG: Successfully linked jpeg file ({jpeg_method}): {jpeg_filename} to {new_jpeg_path}")
+                    # Hardlinked sources are found again through their shared inode
+                    reflinked = [m for m, method in ((pair.mp4, mp4_method), (pair.jpeg, jpeg_method)) if method == "reflink"]
+                    if reflinked:
+                        record_linked_sources(processed_folder, reflinked)
+                except OSError as e:
+                    print(f"DEBUG: Failed to link files {mp4_filename} or {jpeg_filename} in {series_path}: {e}. Skipping this pair.")
+                    continue
+            else:
+                try:
+                    os.rename(os.path.join(series_path, mp4_filename), new_mp4_path)
+                    print(f"DEBUG: Successfully renamed MP4 file: {mp4_filename} to {new_mp4_path}")
+                    os.rename(os.path.join(series_path, jpeg_filename), new_jpeg_path)
+                    print(f"DEBUG: Successfully renamed jpeg file: {jpeg_filename} to {new_jpeg_path}")
+                except OSError as e:
+                    print(f"DEBUG: Failed to rename files {mp4_filename} or {jpeg_filename} in {series_path}: {e}. Skipping this pair.")
+                    continue
+
+            next_episode += 1
+            if summary is not None:
+                summary.pairs += 1
+
+        if durability is not None and unsynced:
+            sync_directories()
+
+def loop_over_directories(series_path, is_ignored=None, root_path=None, **options):
     print(f"DEBUG: Entering loop_over_directories for path: {series_path}")
     if not os.path.isdir(series_path):
         print(f"DEBUG: '{series_path}' is not a directory. Skipping.")
         return
 
+    if root_path is None:
+        root_path = series_path
+        is_ignored = load_ignore_rules(root_path)
+
+    def pruned(path):
+        return is_ignored is not None and is_ignored(os.path.relpath(path, root_path))
+
     for item in os.listdir(series_path):
         if item == "Processed":
             print(f"DEBUG: Skipping 'Processed' folder at {os.path.join(series_path, item)}")
             continue
         item_path = os.path.join(series_path, item)
+        if pruned(item_path):
+            print(f"DEBUG: '{item_path}' matches an ignore rule. Pruning.")
+            continue
         print(f"DEBUG: Checking item: {item_path}")
         if os.path.isdir(item_path):
-            subdirs = [d for d in os.listdir(item_path) if os.path.isdir(os.path.join(item_path, d)) and d != "Processed"]
+            if os.path.exists(os.path.join(item_path, OPT_OUT_MARKER)):
+                print(f"DEBUG: '{item_path}' contains {OPT_OUT_MARKER}. Skipping.")
+                continue
+            # Pruned and opted-out children are never visited, so they must not stop this folder
+            # from being treated as a series folder either
+            subdirs = [
+                d for d in os.listdir(item_path)
+                if d != "Processed"
+                and not pruned(os.path.join(item_path, d))
+                and os.path.isdir(os.path.join(item_path, d))
+                and not os.path.exists(os.path.join(item_path, d, OPT_OUT_MARKER))
+            ]
             if subdirs:
-                loop_over_directories(item_path)
+                loop_over_directories(item_path, is_ignored, root_path, **options)
             else:
                 print(f"DEBUG: '{item_path}' is a series directory. Calling rename_files_in_series.")
-                rename_files_in_series(item_path)
+                rename_files_in_series(item_path, **options)
         else:
             print(f"DEBUG: '{item_path}' is not a directory. Skipping.")
 
@@ -203,7 +874,16 @@ def main():
     root_path = os.path.dirname(os.path.abspath(__file__))
     print(f"DEBUG: Root path set to: {root_path}")
 
-    loop_over_directories(root_path)
+    summary = RunSummary()
+    loop_over_directories(
+        root_path,
+        pair_by_timestamp=PAIR_BY_TIMESTAMP,
+        locking=SERIES_LOCKING,
+        organize=ORGANIZE_MODE,
+        durability=DURABILITY,
+        summary=summary,
+    )
+    summary.report()
     
     print("DEBUG: Main function finished.")
 
@@ -1,15 +1,59 @@
 import unittest
 import os
 import shutil
+import struct
+import subprocess
+import sys
+import time
 import tempfile
+import tracemalloc
+from unittest.mock import patch
+from datetime import datetime
 
 from rename_files_2 import (
     get_series_title,
     get_next_episode_number,
     find_files_to_process,
     rename_files_in_series,
+    read_exif_datetime,
+    pair_files_by_timestamp,
+    scan_series,
+    MediaFile,
+    EpisodePair,
+    RECORD_MEMORY_BUDGET_PER_FILE,
+    parse_recording_timestamp,
+    _numeric_sort_key,
+    series_lock,
+    fcntl,
+    SERIES_LOCK_FILENAME,
+    SERIES_LEASE_SECONDS,
+    link_file,
+    _try_lease,
+    rename_file_pair,
+    loop_over_directories,
+    compile_ignore_rules,
+    IGNORE_FILENAME,
+    OPT_OUT_MARKER,
+    RunSummary,
+    fsync_file,
+    LINKED_MANIFEST_FILENAME,
 )
 
+def make_exif_jpeg(path, date_time_original):
+    # Minimal little-endian JPEG: SOI, APP1 with IFD0 -> Exif IFD -> DateTimeOriginal, EOI
+    value = date_time_original.encode('ascii') + b'\x00'
+    ifd0 = struct.pack('<H', 1) + struct.pack('<HHII', 0x8769, 4, 1, 26) + struct.pack('<I', 0)
+    exif_ifd = struct.pack('<H', 1) + struct.pack('<HHII', 0x9003, 2, len(value), 44) + struct.pack('<I', 0)
+    tiff = b'II' + struct.pack('<HI', 42, 8) + ifd0 + exif_ifd + value
+    app1 = b'Exif\x00\x00' + tiff
+    with open(path, 'wb') as f:
+        f.write(b'\xff\xd8' + b'\xff\xe1' + struct.pack('>H', len(app1) + 2) + app1 + b'\xff\xd9')
+
+def fake_reflink(src, dst):
+    # A reflink is a separate inode with the same data; a copy stands in where FICLONE is unsupported
+    shutil.copy2(src, dst)
+    return 'reflink'
+
 class TestRenameFiles(unittest.TestCase):
 
     def setUp(self):
@@ -82,3 +126,433 @@ class TestRenameFiles(unittest.TestCase):
         # Should not raise, just print error
         rename_files_in_series(self.test_dir)
 
+    def test_read_exif_datetime(self):
+        path = os.path.join(self.test_dir, 'thumb.jpeg')
+        make_exif_jpeg(path, '2025:07:05 10:30:05')
+        self.assertEqual(read_exif_datetime(path), datetime(2025, 7, 5, 10, 30, 5))
+        plain = os.path.join(self.test_dir, 'plain.jpeg')
+        with open(plain, 'wb') as f:
+            f.write(b'not a jpeg')
+        self.assertIsNone(read_exif_datetime(plain))
+
+    def test_pair_files_by_timestamp_reports_unmatched(self):
+        for name in ['2025-07-05 10-00-00.mp4', '2025-07-05 11-00-00.mp4']:
+            open(os.path.join(self.test_dir, name), 'w').close()
+        make_exif_jpeg(os.path.join(self.test_dir, 'b.jpeg'), '2025:07:05 11:00:10')
+        make_exif_jpeg(os.path.join(self.test_dir, 'a.jpeg'), '2025:07:05 10:00:10')
+        make_exif_jpeg(os.path.join(self.test_dir, 'stray.jpeg'), '2025:07:05 10:29:00')
+        series = scan_series(self.test_dir)
+        pairs, unmatched_mp4, unmatched_jpeg = pair_files_by_timestamp(self.test_dir, series.mp4_files, series.jpeg_files)
+        self.assertEqual(
+            [(p.mp4.name, p.jpeg.name) for p in pairs],
+            [('2025-07-05 10-00-00.mp4', 'a.jpeg'), ('2025-07-05 11-00-00.mp4', 'b.jpeg')],
+        )
+        self.assertEqual(unmatched_mp4, [])
+        self.assertEqual([m.name for m in unmatched_jpeg], ['stray.jpeg'])
+
+    def test_pair_files_by_timestamp_max_gap(self):
+        for name in ['2025-07-05 10-00-00.mp4', '2025-07-05 11-00-00.mp4']:
+            open(os.path.join(self.test_dir, name), 'w').close()
+        make_exif_jpeg(os.path.join(self.test_dir, 'a.jpeg'), '2025:07:05 10:00:10')
+        make_exif_jpeg(os.path.join(self.test_dir, 'stray.jpeg'), '2025:07:09 11:00:00')
+        series = scan_series(self.test_dir)
+        pairs, unmatched_mp4, unmatched_jpeg = pair_files_by_timestamp(self.test_dir, series.mp4_files, series.jpeg_files)
+        # The 11:00 video has no thumbnail and the stray one is days away, so neither is paired
+        self.assertEqual([(p.mp4.name, p.jpeg.name) for p in pairs], [('2025-07-05 10-00-00.mp4', 'a.jpeg')])
+        self.assertEqual([m.name for m in unmatched_mp4], ['2025-07-05 11-00-00.mp4'])
+        self.assertEqual([m.name for m in unmatched_jpeg], ['stray.jpeg'])
+
+    def test_pair_files_by_timestamp_uses_record_mtime(self):
+        # Files without a timestamp fall back to the mtime stored by scan_series, without another stat
+        video = MediaFile('clip.mp4', mtime=1000.0)
+        thumb = MediaFile('thumb.jpeg', mtime=1005.0)
+        with open(os.path.join(self.test_dir, 'thumb.jpeg'), 'wb') as f:
+            f.write(b'no exif')
+        with patch('rename_files_2.os.path.getmtime') as mock_getmtime:
+            pairs, unmatched_mp4, unmatched_jpeg = pair_files_by_timestamp(self.test_dir, [video], [thumb])
+        mock_getmtime.assert_not_called()
+        self.assertIs(pairs[0].mp4, video)
+        self.assertIs(pairs[0].jpeg, thumb)
+        self.assertEqual(video.sort_key, 1000.0)
+
+    def test_rename_files_in_series_pair_by_timestamp(self):
+        self.make_series_dir({'index.txt': 'title: Show'})
+        open(os.path.join(self.test_dir, '2025-07-05 10-00-00.mp4'), 'w').close()
+        make_exif_jpeg(os.path.join(self.test_dir, 'Screenshot (2).jpeg'), '2025:07:05 10:00:30')
+        make_exif_jpeg(os.path.join(self.test_dir, 'Screenshot (1).jpeg'), '2025:07:01 09:00:00')
+        rename_files_in_series(self.test_dir, pair_by_timestamp=True)
+        processed = sorted(os.listdir(os.path.join(self.test_dir, 'Processed')))
+        self.assertEqual(processed, ['Show 1.jpeg', 'Show 1.mp4'])
+        # The stray thumbnail is reported and left in place instead of blocking the series
+        self.assertTrue(os.path.exists(os.path.join(self.test_dir, 'Screenshot (1).jpeg')))
+
+    def test_scan_series_records(self):
+        self.make_series_dir({
+            'index.txt': 'title: Show',
+            '2025-07-05 11-00-00.mp4': 'abc',
+            '2025-07-05 10-00-00.mp4': '',
+            'Screenshot (2).jpeg': '',
+            'Screenshot (1).jpeg': '',
+        })
+        series = scan_series(self.test_dir, 'Show')
+        series.sort()
+        self.assertEqual([m.name for m in series.mp4_files], ['2025-07-05 10-00-00.mp4', '2025-07-05 11-00-00.mp4'])
+        self.assertEqual([m.name for m in series.jpeg_files], ['Screenshot (1).jpeg', 'Screenshot (2).jpeg'])
+        self.assertEqual(series.mp4_files[1].size, 3)
+        self.assertIsNotNone(series.jpeg_files[0].sort_key)
+        self.assertFalse(hasattr(series.mp4_files[0], '__dict__'))
+
+    def test_record_memory_budget(self):
+        count = 10000
+        names = [f'2025-07-05 10-{i % 60:02d}-{i % 60:02d}.mp4' for i in range(count)]
+        tracemalloc.start()
+        try:
+            pairs = []
+            for i, name in enumerate(names):
+                mp4 = MediaFile(name, 1 << 30, 1751700000.5, (0, i * 1000, name), 40000000 + 2 * i)
+                jpeg = MediaFile(name, 1 << 16, 1751700000.5, (name.lower(), i), 40000001 + 2 * i)
+                pairs.append(EpisodePair(mp4, jpeg, i + 1))
+            used, _ = tracemalloc.get_traced_memory()
+        finally:
+            tracemalloc.stop()
+        self.assertLessEqual(used / (2 * count), RECORD_MEMORY_BUDGET_PER_FILE)
+
+    def test_parse_recording_timestamp_formats(self):
+        expected = (2025, 7, 5, 22, 30, 5)
+        self.assertEqual(parse_recording_timestamp('2025-07-05 22-30-05.mp4'), expected)
+        self.assertEqual(parse_recording_timestamp('2025-07-05_22-30-05.mp4'), expected)
+        self.assertEqual(parse_recording_timestamp('20250705_223005.mp4'), expected)
+        self.assertEqual(parse_recording_timestamp('Game 2025.07.05 - 22.30.05.01.DVR.mp4'), expected)
+        self.assertEqual(parse_recording_timestamp('Game 7_5_2025 10_30_05 PM.mp4'), expected)
+        self.assertEqual(parse_recording_timestamp('Game 7_5_2025 12_30_05 AM.mp4'), (2025, 7, 5, 0, 30, 5))
+        self.assertIsNone(parse_recording_timestamp('2025-13-05 22-30-05.mp4'))
+        self.assertIsNone(parse_recording_timestamp('2025-02-30 10-00-00.mp4'))
+        self.assertIsNone(parse_recording_timestamp('2025-04-31 10-00-00.mp4'))
+        self.assertIsNone(parse_recording_timestamp('2025-02-29 10-00-00.mp4'))
+        self.assertIsNone(parse_recording_timestamp('1900-02-29 10-00-00.mp4'))
+        self.assertEqual(parse_recording_timestamp('2024-02-29 10-00-00.mp4'), (2024, 2, 29, 10, 0, 0))
+        self.assertEqual(parse_recording_timestamp('2000-02-29 10-00-00.mp4'), (2000, 2, 29, 10, 0, 0))
+        self.assertIsNone(parse_recording_timestamp('clip.mp4'))
+
+    def test_parse_recording_timestamp_no_match(self):
+        for name in ['clip with a long name 12345.mp4', 'clip.mp4', 'Episode 2025 final cut.mp4', '2025-07-05.mp4']:
+            self.assertIsNone(parse_recording_timestamp(name))
+            self.assertEqual(_numeric_sort_key(name), (1, name))
+
+    def test_numeric_sort_key_mixed_recorders(self):
+        files = [
+            'clip.mp4',
+            'Game 7_5_2025 1_00_00 PM.mp4',
+            'Game 2025.07.05 - 09.00.00.01.DVR.mp4',
+            '2025-07-05 11-00-00.mp4',
+        ]
+        self.assertEqual(sorted(files, key=_numeric_sort_key), [
+            'Game 2025.07.05 - 09.00.00.01.DVR.mp4',
+            '2025-07-05 11-00-00.mp4',
+            'Game 7_5_2025 1_00_00 PM.mp4',
+            'clip.mp4',
+        ])
+        self.assertEqual(_numeric_sort_key('2025-07-05 11-00-00.mp4'), (0, 20250705110000, '2025-07-05 11-00-00.mp4'))
+
+    def test_series_lock_lease_skips_busy_series(self):
+        lock_path = os.path.join(self.test_dir, SERIES_LOCK_FILENAME)
+        with series_lock(self.test_dir, 'lease') as first:
+            with series_lock(self.test_dir, 'lease') as second:
+                self.assertTrue(first)
+                self.assertFalse(second)
+            self.assertTrue(os.path.exists(lock_path))
+        self.assertFalse(os.path.exists(lock_path))
+
+    def test_series_lock_lease_takes_over_expired_lease(self):
+        lock_path = os.path.join(self.test_dir, SERIES_LOCK_FILENAME)
+        with open(lock_path, 'w') as f:
+            f.write('otherhost 1 0')
+        expired = time.time() - SERIES_LEASE_SECONDS - 60
+        os.utime(lock_path, (expired, expired))
+        with series_lock(self.test_dir, 'lease') as acquired:
+            self.assertTrue(acquired)
+
+    def interleave_lease_takeover(self, hook_name):
+        # Host A is paused at its first os.<hook_name>(lease) call while host B runs a whole takeover
+        lock_path = os.path.join(self.test_dir, SERIES_LOCK_FILENAME)
+        with open(lock_path, 'w') as f:
+            f.write('deadhost 1 0')
+        expired = time.time() - SERIES_LEASE_SECONDS - 60
+        os.utime(lock_path, (expired, expired))
+
+        real = getattr(os, hook_name)
+        results = {}
+
+        def hooked(path, *args, **kwargs):
+            if path == lock_path and 'b' not in results:
+                results['b'] = None
+                results['b'] = _try_lease(lock_path, 'host B')
+            return real(path, *args, **kwargs)
+
+        with patch(f'rename_files_2.os.{hook_name}', side_effect=hooked):
+            results['a'] = _try_lease(lock_path, 'host A')
+        return results, lock_path
+
+    def test_lease_takeover_race_after_stale_check(self):
+        results, lock_path = self.interleave_lease_takeover('stat')
+        self.assertEqual(sorted([results['a'], results['b']]), [False, True])
+        with open(lock_path) as f:
+            self.assertEqual(f.read(), 'host B')
+        self.assertEqual(os.listdir(self.test_dir), [SERIES_LOCK_FILENAME])
+
+    def test_lease_takeover_race_during_removal(self):
+        results, lock_path = self.interleave_lease_takeover('remove')
+        self.assertEqual(sorted([results['a'], results['b']]), [False, True])
+        self.assertEqual(os.listdir(self.test_dir), [SERIES_LOCK_FILENAME])
+
+    def test_series_lock_lease_renew(self):
+        lock_path = os.path.join(self.test_dir, SERIES_LOCK_FILENAME)
+        with series_lock(self.test_dir, 'lease') as lock:
+            nearly_expired = time.time() - SERIES_LEASE_SECONDS + 5
+            os.utime(lock_path, (nearly_expired, nearly_expired))
+            self.assertTrue(lock.renew())
+            self.assertGreater(os.path.getmtime(lock_path), nearly_expired + 60)
+
+            with open(lock_path, 'w') as f:
+                f.write('host B')
+            self.assertFalse(lock.renew())
+            self.assertFalse(lock)
+        # The lease now belongs to host B, so releasing ours must leave it alone
+        with open(lock_path) as f:
+            self.assertEqual(f.read(), 'host B')
+
+    def test_rename_files_in_series_stops_when_lease_taken_over(self):
+        self.make_pairs(3)
+        lock_path = os.path.join(self.test_dir, SERIES_LOCK_FILENAME)
+        real_rename_file_pair = rename_file_pair
+        results = {}
+
+        def expire_and_take_over(*args):
+            # While the first pair is being renamed, the lease expires and host B takes it over
+            if 'b' not in results:
+                expired = time.time() - SERIES_LEASE_SECONDS - 60
+                os.utime(lock_path, (expired, expired))
+                results['b'] = _try_lease(lock_path, 'host B')
+            return real_rename_file_pair(*args)
+
+        with patch('rename_files_2.rename_file_pair', side_effect=expire_and_take_over):
+            rename_files_in_series(self.test_dir, locking='lease')
+        self.assertTrue(results['b'])
+        self.assertEqual(sorted(os.listdir(os.path.join(self.test_dir, 'Processed'))), ['Show 1.jpeg', 'Show 1.mp4'])
+        self.assertTrue(os.path.exists(os.path.join(self.test_dir, 'foo 2.mp4')))
+        with open(lock_path) as f:
+            self.assertEqual(f.read(), 'host B')
+
+    @unittest.skipIf(fcntl is None, 'fcntl is not available on this platform')
+    def test_series_lock_fcntl_held_by_other_process(self):
+        lock_path = os.path.join(self.test_dir, SERIES_LOCK_FILENAME)
+        holder = subprocess.Popen(
+            [sys.executable, '-c',
+             'import fcntl, sys; f = open(sys.argv[1], "a+"); fcntl.lockf(f, fcntl.LOCK_EX); '
+             'print("locked", flush=True); sys.stdin.read()',
+             lock_path],
+            stdin=subprocess.PIPE, stdout=subprocess.PIPE, text=True,
+        )
+        try:
+            self.assertEqual(holder.stdout.readline().strip(), 'locked')
+            with series_lock(self.test_dir, 'fcntl') as acquired:
+                self.assertFalse(acquired)
+        finally:
+            holder.communicate('')
+        with series_lock(self.test_dir, 'fcntl') as acquired:
+            self.assertTrue(acquired)
+
+    def test_rename_files_in_series_skips_locked_series(self):
+        self.make_series_dir({
+            'index.txt': 'title: Show',
+            'foo 1.mp4': '',
+            'foo 1.jpeg': '',
+            SERIES_LOCK_FILENAME: 'otherhost 1 0',
+        })
+        rename_files_in_series(self.test_dir, locking='lease')
+        self.assertFalse(os.path.exists(os.path.join(self.test_dir, 'Processed')))
+        self.assertTrue(os.path.exists(os.path.join(self.test_dir, 'foo 1.mp4')))
+
+    def test_link_file(self):
+        src = os.path.join(self.test_dir, 'src.mp4')
+        dst = os.path.join(self.test_dir, 'dst.mp4')
+        with open(src, 'w') as f:
+            f.write('video')
+        self.assertIn(link_file(src, dst), ('reflink', 'hardlink'))
+        with open(dst) as f:
+            self.assertEqual(f.read(), 'video')
+        with self.assertRaises(FileExistsError):
+            link_file(src, dst)
+
+    def test_rename_files_in_series_link_mode(self):
+        self.make_series_dir({
+            'index.txt': 'title: Show',
+            'foo 1.mp4': 'video',
+            'foo 1.jpeg': 'thumb',
+        })
+        rename_files_in_series(self.test_dir, organize='link')
+        processed_path = os.path.join(self.test_dir, 'Processed')
+        self.assertTrue(os.path.exists(os.path.join(self.test_dir, 'foo 1.mp4')))
+        self.assertTrue(os.path.exists(os.path.join(self.test_dir, 'foo 1.jpeg')))
+        with open(os.path.join(processed_path, 'Show 1.mp4')) as f:
+            self.assertEqual(f.read(), 'video')
+
+        # Already-linked sources are not organized again; new files continue the numbering
+        with open(os.path.join(self.test_dir, 'foo 2.mp4'), 'w') as f:
+            f.write('video 2')
+        with open(os.path.join(self.test_dir, 'foo 2.jpeg'), 'w') as f:
+            f.write('thumb 2')
+        rename_files_in_series(self.test_dir, organize='link')
+        episodes = sorted(f for f in os.listdir(processed_path) if not f.startswith('.'))
+        self.assertEqual(episodes, ['Show 1.jpeg', 'Show 1.mp4', 'Show 2.jpeg', 'Show 2.mp4'])
+        with open(os.path.join(processed_path, 'Show 2.jpeg')) as f:
+            self.assertEqual(f.read(), 'thumb 2')
+
+    def test_rename_files_in_series_link_mode_reused_name(self):
+        self.make_series_dir({
+            'index.txt': 'title: Show',
+            'Screenshot (1).mp4': 'video',
+            'Screenshot (1).jpeg': 'thumb',
+        })
+        rename_files_in_series(self.test_dir, organize='link')
+
+        # The raw files are deleted and a new recording reuses the same names
+        for name, content in [('Screenshot (1).mp4', 'new video'), ('Screenshot (1).jpeg', 'new thumb')]:
+            path = os.path.join(self.test_dir, name)
+            os.remove(path)
+            with open(path, 'w') as f:
+                f.write(content)
+            os.utime(path, (2000000000, 2000000000))
+        rename_files_in_series(self.test_dir, organize='link')
+
+        processed_path = os.path.join(self.test_dir, 'Processed')
+        with open(os.path.join(processed_path, 'Show 1.jpeg')) as f:
+            self.assertEqual(f.read(), 'thumb')
+        with open(os.path.join(processed_path, 'Show 2.jpeg')) as f:
+            self.assertEqual(f.read(), 'new thumb')
+
+    def test_rename_files_in_series_link_mode_touched_hardlink(self):
+        self.make_series_dir({
+            'index.txt': 'title: S',
+            'a.mp4': 'video a',
+            'a.jpeg': 'thumb a',
+            'b.mp4': 'video b',
+            'b.jpeg': 'thumb b',
+        })
+        with patch('rename_files_2.link_file', side_effect=lambda src, dst: os.link(src, dst) or 'hardlink'):
+            rename_files_in_series(self.test_dir, organize='link')
+            processed_path = os.path.join(self.test_dir, 'Processed')
+            # Re-timestamping organized episodes also changes their hardlinked sources
+            os.utime(os.path.join(processed_path, 'S 1.mp4'), (2000000000, 2000000000))
+            os.utime(os.path.join(processed_path, 'S 1.jpeg'), (2000000000, 2000000000))
+            os.utime(os.path.join(processed_path, 'S 2.mp4'), (2000000000, 2000000000))
+            with open(os.path.join(self.test_dir, 'c.mp4'), 'w') as f:
+                f.write('video c')
+            with open(os.path.join(self.test_dir, 'c.jpeg'), 'w') as f:
+                f.write('thumb c')
+            rename_files_in_series(self.test_dir, organize='link')
+        # Nothing is linked twice and the series is not blocked: only the new pair is organized
+        episodes = sorted(f for f in os.listdir(processed_path) if not f.startswith('.'))
+        self.assertEqual(episodes, ['S 1.jpeg', 'S 1.mp4', 'S 2.jpeg', 'S 2.mp4', 'S 3.jpeg', 'S 3.mp4'])
+        self.assertTrue(os.path.samefile(os.path.join(processed_path, 'S 3.mp4'), os.path.join(self.test_dir, 'c.mp4')))
+
+    def test_rename_files_in_series_link_mode_reflink_manifest(self):
+        self.make_pairs(1)
+        with patch('rename_files_2.link_file', side_effect=fake_reflink):
+            rename_files_in_series(self.test_dir, organize='link')
+            rename_files_in_series(self.test_dir, organize='link')
+        processed_path = os.path.join(self.test_dir, 'Processed')
+        self.assertEqual(sorted(os.listdir(processed_path)), [LINKED_MANIFEST_FILENAME, 'Show 1.jpeg', 'Show 1.mp4'])
+
+    def test_compile_ignore_rules(self):
+        is_ignored = compile_ignore_rules(['# comment', '', '.git', '*_renders/', '/Archive/2019*'])
+        self.assertTrue(is_ignored('.git'))
+        self.assertTrue(is_ignored(os.path.join('Game', 'Series', '.git')))
+        self.assertTrue(is_ignored(os.path.join('Game', 'boss_renders')))
+        self.assertTrue(is_ignored(os.path.join('Archive', '2019 Runs')))
+        self.assertFalse(is_ignored(os.path.join('Game', 'Archive', '2019 Runs')))
+        self.assertFalse(is_ignored(os.path.join('Game', 'Series')))
+        self.assertIsNone(compile_ignore_rules(['# nothing here']))
+
+    @patch('rename_files_2.rename_files_in_series')
+    def test_loop_over_directories_prunes_ignored_and_opted_out(self, mock_rename):
+        self.make_series_dir({
+            IGNORE_FILENAME: '.git\nArchive\n',
+            'Game/Series A/index.txt': 'title: A',
+            'Game/Series A/.git/HEAD': '',
+            'Game/Series B/index.txt': 'title: B',
+            f'Game/Series B/{OPT_OUT_MARKER}': '',
+            'Game/Series C/index.txt': 'title: C',
+            f'Game/Series C/Raw/{OPT_OUT_MARKER}': '',
+            'Archive/Old Game/Old Series/index.txt': 'title: Old',
+        })
+        with patch('rename_files_2.os.listdir', wraps=os.listdir) as mock_listdir:
+            loop_over_directories(self.test_dir)
+        # Series C's opted-out Raw folder is skipped but does not hide Series C itself
+        self.assertEqual(
+            sorted(call.args[0] for call in mock_rename.call_args_list),
+            [os.path.join(self.test_dir, 'Game', 'Series A'), os.path.join(self.test_dir, 'Game', 'Series C')],
+        )
+        listed = [call.args[0] for call in mock_listdir.call_args_list]
+        self.assertNotIn(os.path.join(self.test_dir, 'Archive'), listed)
+        self.assertNotIn(os.path.join(self.test_dir, 'Game', 'Series B'), listed)
+        self.assertNotIn(os.path.join(self.test_dir, 'Game', 'Series C', 'Raw'), listed)
+
+    def make_pairs(self, count):
+        structure = {'index.txt': 'title: Show'}
+        for i in range(1, count + 1):
+            structure[f'foo {i}.mp4'] = ''
+            structure[f'foo {i}.jpeg'] = ''
+        self.make_series_dir(structure)
+
+    def test_durability_once_per_series(self):
+        self.make_pairs(5)
+        summary = RunSummary()
+        rename_files_in_series(self.test_dir, durability='series', summary=summary)
+        self.assertEqual(summary.series, 1)
+        self.assertEqual(summary.pairs, 5)
+        # Source folder and Processed, once each
+        self.assertEqual(summary.fsyncs, 2)
+        self.assertGreaterEqual(summary.fsync_seconds, 0.0)
+
+    def test_durability_every_n_pairs(self):
+        self.make_pairs(5)
+        summary = RunSummary()
+        with patch('rename_files_2.os.fsync', wraps=os.fsync) as mock_fsync:
+            rename_files_in_series(self.test_dir, durability=2, summary=summary)
+        # After pairs 2 and 4, then once more for pair 5
+        self.assertEqual(summary.fsyncs, 6)
+        self.assertEqual(mock_fsync.call_count, 6)
+        self.assertEqual(len(os.listdir(os.path.join(self.test_dir, 'Processed'))), 10)
+
+    def test_durability_disabled_by_default(self):
+        self.make_pairs(2)
+        summary = RunSummary()
+        rename_files_in_series(self.test_dir, summary=summary)
+        self.assertEqual(summary.pairs, 2)
+        self.assertEqual(summary.fsyncs, 0)
+        with self.assertRaises(ValueError):
+            rename_files_in_series(self.test_dir, durability='always')
+        for invalid in (True, False, 0):
+            with self.assertRaises(ValueError):
+                rename_files_in_series(self.test_dir, durability=invalid)
+
+    def test_durability_counts_failed_fsyncs_separately(self):
+        self.make_pairs(1)
+        summary = RunSummary()
+        with patch('rename_files_2.os.fsync', side_effect=OSError('not supported')):
+            rename_files_in_series(self.test_dir, durability='series', summary=summary)
+        self.assertEqual(summary.pairs, 1)
+        self.assertEqual(summary.fsyncs, 0)
+        self.assertEqual(summary.fsync_failures, 2)
+
+    def test_durability_syncs_link_manifest(self):
+        self.make_pairs(2)
+        summary = RunSummary()
+        with patch('rename_files_2.link_file', side_effect=fake_reflink), \
+             patch('rename_files_2.fsync_file', wraps=fsync_file) as mock_fsync_file:
+            rename_files_in_series(self.test_dir, organize='link', durability='series', summary=summary)
+        manifest = os.path.join(self.test_dir, 'Processed', LINKED_MANIFEST_FILENAME)
+        mock_fsync_file.assert_called_once_with(manifest, summary)
+        # Manifest, source folder and Processed, once each
+        self.assertEqual(summary.fsyncs, 3)